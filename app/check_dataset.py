@@ -1,22 +1,116 @@
 """Run Quality Checks against human generated datasets"""
 
-import sys
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from loguru import logger
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
 from datetime import timedelta
+from typing import Dict, List, Tuple
 
 import app.checks as checks
 from .qc_config import QCConfig
 from .data.data_source import DataSource
 from .log.result_log import ResultLog
-from .modeling.forecast_io import load_forecast_hd5
-from .modeling.forecast_plot import plot_to_file
 from .util import udatetime
 #import .util import 
 
+def _optimize_checks_df(df: pd.DataFrame) -> pd.DataFrame:
+    " store the counts the checks read as int32 "
+    df = df.copy()
+    for c in checks.COUNT_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].fillna(0).astype(np.int32)
+    return df
+
+
+def group_by_state(df: pd.DataFrame, newest_first = False) -> Dict[str, pd.DataFrame]:
+    """Split a dataset into a frame per state so the checks can look them up by key
+
+    if newest_first is set, each frame is sorted by date (newest first)
+    """
+    if df is None: return {}
+
+    # sort once so each state is a contiguous block, then slice the blocks by offset
+    df = df[df["state"].notna()]
+    if newest_first:
+        df = df.sort_values(["state", "date"], ascending=[True, False], kind="mergesort")
+    else:
+        df = df.sort_values("state", kind="mergesort")
+
+    states = df["state"].to_numpy()
+    names, starts = np.unique(states, return_index=True)
+    ends = np.r_[starts[1:], len(states)]
+    return { name: df.iloc[s:e] for name, s, e in zip(names, starts, ends) }
+
+
+def run_batch(check, df: pd.DataFrame, log: ResultLog, *args, **kwargs):
+    """Run a batch_* check over all states
+
+    If it fails, the check is rerun one state at a time so a bad row only loses the
+    results for that state (same as the per-state loop).
+    """
+    n_messages = len(log.messages)
+    try:
+        check(df, log, *args, **kwargs)
+        return
+    except Exception as ex:
+        logger.exception(ex)
+        del log.messages[n_messages:]
+
+    for i in range(df.shape[0]):
+        try:
+            check(df.iloc[i:i+1], log, *args, **kwargs)
+        except Exception as ex:
+            log.internal(df["state"].iat[i], f"{ex}")
+
+
+def _plot_forecast(results_dir: str, images_dir: str, state: str, date: int, fit_thresholds: List[float]) -> bool:
+    " reload a saved forecast and plot it, runs in a worker process "
+    from .modeling.forecast_io import load_forecast_hd5
+    from .modeling.forecast_plot import plot_to_file
+
+    forecast = load_forecast_hd5(results_dir, state, date)
+    if forecast is None: return False
+    plot_to_file(forecast, images_dir, fit_thresholds)
+    return True
+
+def plot_forecasts(to_plot: List[Tuple[str, int]], config: QCConfig, log: ResultLog, context: str):
+    """Plot the saved forecasts for (state, date) pairs
+
+    Each state is independent so they are plotted in parallel.
+    """
+    if len(to_plot) == 0: return
+
+    images_dir = f"{config.images_dir}/{context}"
+    n_workers = min(os.cpu_count() or 1, len(to_plot))
+
+    cnt = 0
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {}
+        for state, date in to_plot:
+            f = executor.submit(_plot_forecast, config.results_dir, images_dir, state, int(date), checks.FIT_THRESHOLDS)
+            futures[f] = (state, date)
+
+        for f in as_completed(futures):
+            state, date = futures[f]
+            try:
+                if not f.result():
+                    logger.warning(f"Could not load forecast for {state}/{date}")
+                    continue
+            except Exception as ex:
+                logger.exception(ex)
+                log.internal(state, f"{ex}")
+                continue
+
+            cnt += 1
+            if cnt % 10 == 0:
+                logger.info(f"  plotted {cnt} states")
+    if cnt % 10 != 0 or cnt == 0:
+        logger.info(f"  plotted {cnt} states")
+
+
 def check_working(ds: DataSource, config: QCConfig) -> ResultLog:
     """
     Check unpublished results in the working google sheet
@@ -40,6 +134,7 @@ def check_working(ds: DataSource, config: QCConfig) -> ResultLog:
 
     df = ds.working
     if df is None: return None
+    df = _optimize_checks_df(df)
 
     df["targetDate"] = d.year * 10000 + d.month * 100 + d.day
     df["targetDateEt"] = d
@@ -49,21 +144,28 @@ def check_working(ds: DataSource, config: QCConfig) -> ResultLog:
 
     # *** WHEN YOU CHANGE A CHECK THAT IMPACTS WORKING, MAKE SURE TO UPDATE THE EXCEL TRACKING DOCUMENT ***
 
+    run_batch(checks.batch_basic, df, log)
+    run_batch(checks.batch_last_update, df, log, d)
+    run_batch(checks.batch_last_checked, df, log, d)
+    run_batch(checks.batch_checkers_initials, df, log, d)
+
+    # split the history/counties once instead of filtering them for every state
+    history = ds.history
+    history_by_state = group_by_state(history, newest_first=True)
+    empty_history = history.iloc[0:0] if history is not None else None
+    county_rollup_by_state = group_by_state(ds.county_rollup)
+
+    # forecasts are plotted after the loop so they can run in parallel
+    plot_saved = config.plot_models and config.save_results
+    to_plot = []
+
     cnt = 0
     for row in df.itertuples():
         try:
 
-            checks.total(row, log)
             #checks.total_tests(row, log)
-            checks.last_update(row, log)
-            checks.last_checked(row, log)
-            checks.checkers_initials(row, log)
-            checks.positives_rate(row, log)
-            checks.death_rate(row, log)
-            checks.less_recovered_than_positive(row, log)
-            checks.pendings_rate(row, log)
-
-            df_history = ds.history[ds.history.state == row.state]
+
+            df_history = history_by_state.get(row.state, empty_history)
             has_changed = checks.increasing_values(row, df_history, log, config)
             if has_changed:
                 checks.expected_positive_increase(row, df_history, log, "working", config)
@@ -71,10 +173,12 @@ def check_working(ds: DataSource, config: QCConfig) -> ResultLog:
             #checks.delta_vs_cumulative(row, df_history, log, config)
 
 
-            if not ds.county_rollup is None:
-                df_county_rollup = ds.county_rollup[ds.county_rollup.state == row.state]
-                if  not df_county_rollup.empty:
-                    checks.counties_rollup_to_state(row, df_county_rollup, log)
+            df_county_rollup = county_rollup_by_state.get(row.state)
+            if df_county_rollup is not None:
+                checks.counties_rollup_to_state(row, df_county_rollup, log)
+
+            if plot_saved:
+                to_plot.append((row.state, row.targetDate))
 
         except Exception as ex:
             logger.exception(ex)
@@ -87,26 +191,10 @@ def check_working(ds: DataSource, config: QCConfig) -> ResultLog:
     logger.info(f"  processed {cnt} states")
 
     checks.missing_tests(log)
+    plot_forecasts(to_plot, config, log, "working")
 
-
-    # run loop at end, insted of during run
-    if config.plot_models and config.save_results:
-        cnt = 0
-        for row in df.itertuples():
-            try:
-                forecast = load_forecast_hd5(config.results_dir, row.state, row.targetDate)
-                if forecast is None:
-                    logger.warning(f"Could not load forecast for {row.state}/{row.targetDate}")
-                else:
-                    plot_to_file(forecast, f"{config.images_dir}/working", checks.FIT_THRESHOLDS)
-            except Exception as ex:
-                logger.exception(ex)
-                log.internal(row.state, f"{ex}")
-        if cnt != 0 and cnt % 10 == 0:
-            logger.info(f"  plotted {cnt} states")
-        cnt += 1
-        logger.info(f"  plotted {cnt} states")
-
+    # the batch checks report all states at once, list the messages by state again
+    log.sort_by_location(df["state"].tolist())
     log.consolidate()
     return log
 
@@ -120,6 +208,7 @@ def check_current(ds: DataSource, config: QCConfig) -> ResultLog:
 
     df = ds.current
     if df is None: return None
+    df = _optimize_checks_df(df)
 
     publish_date = 20200403
     logger.warning(f" ** current-date is hard-coded to {publish_date}")
@@ -137,23 +226,26 @@ def check_current(ds: DataSource, config: QCConfig) -> ResultLog:
     df["lastCheckEt"] = df["targetDateEt"]
     df["phase"] = "publish"
 
-    for row in df.itertuples():
-        checks.total(row, log)
-        checks.last_update(row, log)
-        checks.positives_rate(row, log)
-        checks.death_rate(row, log)
-        checks.pendings_rate(row, log)
+    # the published data is not checked for recovered > positive
+    run_batch(checks.batch_basic, df, log, check_recovered=False)
+    run_batch(checks.batch_last_update, df, log, publish_timestamp)
+
+    history = ds.history
+    history_by_state = group_by_state(history, newest_first=True)
+    empty_history = history.iloc[0:0] if history is not None else None
+    county_rollup_by_state = group_by_state(ds.county_rollup)
 
-        df_history = ds.history[ds.history.state == row.state]
+    for row in df.itertuples():
+        df_history = history_by_state.get(row.state, empty_history)
         has_changed = checks.increasing_values(row, df_history, log, config)
         if has_changed:
             checks.expected_positive_increase(row, df_history, log, "current", config)
 
-        if not ds.county_rollup is None:
-            df_county_rollup = ds.county_rollup[ds.county_rollup.state == row.state]
-            if not df_county_rollup.empty:
-                checks.counties_rollup_to_state(row, df_county_rollup, log)
+        df_county_rollup = county_rollup_by_state.get(row.state)
+        if df_county_rollup is not None:
+            checks.counties_rollup_to_state(row, df_county_rollup, log)
 
+    log.sort_by_location(df["state"].tolist())
     log.consolidate()
     return log
 
@@ -168,10 +260,11 @@ def check_history(ds: DataSource) -> ResultLog:
     df = ds.history
     if df is None: return None
 
-    for state in df["state"].drop_duplicates().values:
-        state_df = df.loc[df["state"] == state]
+    for state_df in group_by_state(df).values():
         checks.monotonically_increasing(state_df, log)
 
+    # group_by_state visits the states alphabetically, list them in dataset order
+    log.sort_by_location(df["state"].drop_duplicates().tolist())
     log.consolidate()
     return log
 
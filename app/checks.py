@@ -3,6 +3,9 @@
 #
 #   Each routine checks a specific aspect of a single state
 #
+#   Routines named batch_* check all the states in a frame at once; the
+#   values are compared as whole columns and only the failures are logged.
+#
 #   If any issues are found, the check routine calls the log to report it.
 #   Each message has a category.  See ResultLog for a list of categories.
 #
@@ -27,10 +30,8 @@ from typing import Tuple
 from app.util import udatetime
 
 from .qc_config import QCConfig
-from .log.result_log import ResultLog
+from .log.result_log import ResultLog, ResultCategory
 from .modeling.forecast import Forecast
-from .modeling.forecast_plot import plot_to_file
-from .modeling.forecast_io import save_forecast_hd5, load_forecast_hd5
 
 START_OF_TIME = udatetime.naivedatetime_as_eastern(datetime(2020,1,2))
 
@@ -79,40 +80,85 @@ def missing_tests(log: ResultLog):
 
 # ----------------------------------------------------------------
 
-def total(row, log: ResultLog):
-    """Check that pendings, positive, and negative sum to the reported total"""
+# count columns read by the checks (including the ones that are turned off),
+# check_dataset stores these as int32
+COUNT_COLUMNS = ["positive", "negative", "pending", "death", "recovered", "total", "totalTestResults",
+    "hospitalized", "inIcu", "onVentilator",
+    "hospitalizedCumulative", "inIcuCumulative", "onVentilatorCumulative"]
+
+def batch_basic(df: pd.DataFrame, log: ResultLog, check_recovered = True):
+    """Run the simple count checks for all states at once
+
+    Covers the formula (positive + negative + pending = total), the positive/death/pending
+    rates, and recovered vs positive (if check_recovered).  Values are compared as whole
+    columns and messages are only built for the rows that fail.
+    """
 
-    n_pos, n_neg, n_pending, n_death, n_tot = \
-        row.positive, row.negative, row.pending, row.death, row.total
+    states = df["state"].to_numpy()
+    n_pos = df["positive"].to_numpy()
+    n_neg = df["negative"].to_numpy()
+    n_pending = df["pending"].to_numpy()
+    n_death = df["death"].to_numpy()
+    n_tot = df["total"].to_numpy()
+    n_recovered = df["recovered"].to_numpy()
+
+    # --- total
 
     def bad_value_msg(name: str, val: int) -> str:
         if val == -1000: return f"{name} is blank"
         if val == -1001: return f"{name} is invalid"
         return f"{name} is negative ({val})"
 
-    if n_pending == -1000: # allow blanks
-        n_pending = 0
+    n_pending_adj = np.where(n_pending == -1000, 0, n_pending) # allow blanks
+
+    is_bad = np.zeros(len(states), dtype=bool)
+    for name, vals in [("positive", n_pos), ("negative", n_neg), ("pending", n_pending_adj), ("death", n_death)]:
+        mask = vals < 0
+        for i in np.flatnonzero(mask):
+            log.data_entry(states[i], bad_value_msg(name, vals[i]))
+        is_bad |= mask
+
+    n_diff = n_tot - (n_pos + n_neg + n_pending_adj)
+    for i in np.flatnonzero(~is_bad & (n_tot < 0)):
+        log.data_entry(states[i], bad_value_msg("total", n_tot[i]))
+    idx = np.flatnonzero(~is_bad & (n_tot >= 0) & (n_diff != 0))
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx],
+        "Formula broken -> Positive ({}) + Negative ({}) + Pending ({}) != Total ({}), delta = {}",
+        n_pos[idx], n_neg[idx], n_pending_adj[idx], n_tot[idx], n_diff[idx])
+
+    # --- rates (relative to positive + negative)
+
+    n_results = n_pos + n_neg
+    has_results = n_results > 0
+    n_divisor = np.where(has_results, n_results, 1)
+
+    # positives should compose <40% test results
+    percent_pos = np.where(has_results, 100.0 * n_pos / n_divisor, 0.0)
+    mask = np.where(n_results > 100, percent_pos > 40.0, percent_pos > 80.0) & (n_pos > 20)
+    idx = np.flatnonzero(mask)
+    log.record_many(ResultCategory.DATA_QUALITY, states[idx], "high positives rate {:.0f}% (positive={:,}, total={:,})",
+        percent_pos[idx], n_pos[idx], n_results[idx])
+
+    # deaths should be <5% of test results
+    percent_deaths = np.where(has_results, 100.0 * n_death / n_divisor, 0.0)
+    mask = np.where(n_results > 100, percent_deaths > 5.0, percent_deaths > 10.0)
+    idx = np.flatnonzero(mask)
+    log.record_many(ResultCategory.DATA_QUALITY, states[idx], "high death rate {:.0f}% (positive={:,}, total={:,})",
+        percent_deaths[idx], n_death[idx], n_results[idx])
+
+    # we shouldn't have more recovered than positive
+    if check_recovered:
+        idx = np.flatnonzero(n_recovered > n_pos)
+        log.record_many(ResultCategory.DATA_QUALITY, states[idx], "More recovered than positive (recovered={:,}, positive={:,})",
+            n_recovered[idx], n_pos[idx])
+
+    # pendings should not be more than 20% of total
+    percent_pending = np.where(has_results, 100.0 * n_pending / n_divisor, 0.0)
+    mask = np.where(n_results > 1000, percent_pending > 20.0, percent_pending > 80.0)
+    idx = np.flatnonzero(mask)
+    log.record_many(ResultCategory.DATA_QUALITY, states[idx], "high pending rate {:.0f}% (pending={:,}, total={:,})",
+        percent_pending[idx], n_pending[idx], n_results[idx])
 
-    is_bad = False
-    if n_pos < 0:
-        is_bad = True
-        log.data_entry(row.state, bad_value_msg("positive", n_pos))
-    if n_neg < 0:
-        is_bad = True
-        log.data_entry(row.state, bad_value_msg("negative", n_neg))
-    if n_pending < 0:
-        is_bad = True
-        log.data_entry(row.state, bad_value_msg("pending", n_pending))
-    if n_death < 0:
-        is_bad = True
-        log.data_entry(row.state, bad_value_msg("death", n_death))
-    
-    n_diff = n_tot - (n_pos + n_neg + n_pending)
-    if not is_bad:
-        if n_tot < 0:
-            log.data_entry(row.state, bad_value_msg("total", n_tot))
-        elif n_diff != 0:
-            log.data_entry(row.state, f"Formula broken -> Positive ({n_pos}) + Negative ({n_neg}) + Pending ({n_pending}) != Total ({n_tot}), delta = {n_diff}")
 
 def total_tests(row, log: ResultLog):
     """Check that positive, and negative sum to the reported totalTest"""
@@ -127,134 +173,78 @@ def total_tests(row, log: ResultLog):
         log.data_entry(row.state, f"Formula broken -> Positive ({n_pos}) + Negative ({n_neg}) != Total Tests ({n_tests}), delta = {n_diff}")
 
 
-def last_update(row, log: ResultLog):
-    """Source has updated within a reasonable timeframe"""
-
-    updated_at = row.lastUpdateEt.to_pydatetime()
-    target_time = row.targetDateEt.to_pydatetime()
-    delta = target_time - updated_at
-    days = delta.total_seconds() / (24 * 60.0 * 60)
-
-    if days >= 1.5:
-        log.data_source(row.state, f"source hasn't updated in {days:.1f} days")
-    #elif hours > 18.0:
-    #   log.data_source(row.state, f"Last Updated (col T) hasn't been updated in {hours:.0f}  hours")
-
-def last_checked(row, log: ResultLog):
-    """Data was checked within a reasonable timeframe"""
-
-    target_date = row.targetDateEt.to_pydatetime()
-    updated_at = row.lastUpdateEt.to_pydatetime()
-    checked_at = row.lastCheckEt.to_pydatetime()
-
-    if checked_at <= START_OF_TIME:
-        phase = row.phase
-        if phase == "inactive":
-            pass
-        elif phase in ["publish", "update"]:
-            log.data_entry(row.state, f"last check ET (column AK) is blank", message_id="check_is_blank")
-        elif phase in ["prepare", "cleanup"]:
-            pass
-        return
-
-    delta = updated_at - checked_at
-    hours = delta.total_seconds() / (60.0 * 60)
-    if hours > 1.0:
-        s_updated = updated_at.strftime('%m/%d %H:%M')
-        s_checked = checked_at.strftime('%m/%d %H:%M')
-        log.data_entry(row.state, f"Last Check ET (column AJ) is {s_checked} which is less than Last Update ET (column AI)  {s_updated} by {hours:.0f} hours")
-        return
-
-    delta = target_date - checked_at
-    hours = delta.total_seconds() / (60.0 * 60)
-    if hours > 6.0:
-        s_checked = checked_at.strftime('%m/%d %H:%M')
-        log.data_entry(row.state, f"Last Check ET (column AJ) has not been updated in {hours:.0f} hours ({s_checked} by {row.checker})")
-        return
-
-
-def checkers_initials(row, log: ResultLog):
-    """Confirm that checker initials are records"""
-
-    phase = row.phase
-    if phase == "inactive": return
+NS_PER_HOUR = 60 * 60 * 1_000_000_000
 
-    target_date = row.targetDateEt.to_pydatetime()
-    checked_at = row.lastCheckEt.to_pydatetime()
-    if checked_at <= START_OF_TIME: return
+def _as_epoch_ns(s: pd.Series) -> np.ndarray:
+    " tz-aware timestamps as int64 nanoseconds since the epoch "
+    return s.to_numpy(dtype="datetime64[ns]").view("i8")
 
-    is_near_release = phase in ["publish", "update"]
+def batch_last_update(df: pd.DataFrame, log: ResultLog, target_time: datetime):
+    """Sources have updated within a reasonable timeframe
 
-    checker = row.checker.strip()
-    doubleChecker = row.doubleChecker.strip()
-
-    delta_hours = (target_date - checked_at).total_seconds() / (60.0 * 60.0)
+    target_time is the (tz-aware) time of the run, it is the same for all states
+    """
 
-    if checker == "":
-        if 0 < delta_hours < 5:
-            s_checked = checked_at.strftime('%m/%d %H:%M')
-            log.data_entry(row.state, f"missing checker initials (column AK) but checked date set recently (at {s_checked})")
-        elif is_near_release:
-            log.data_entry(row.state, f"missing checker initials (column AK)")
-        return
-    if doubleChecker == "":
-        if is_near_release:
-            log.data_entry(row.state, f"missing double-checker initials (column AL)")
-        return
+    states = df["state"].to_numpy()
+    updated_at = _as_epoch_ns(df["lastUpdateEt"])
+    days = (pd.Timestamp(target_time).value - updated_at) / (24.0 * NS_PER_HOUR)
 
-    #elif hours > 18.0:
-    #   log.data_source(row.state, f"Last Updated (col T) hasn't been updated in {hours:.0f}  hours")
+    idx = np.flatnonzero(days >= 1.5)
+    log.record_many(ResultCategory.DATA_SOURCE, states[idx], "source hasn't updated in {:.1f} days", days[idx])
 
+def batch_last_checked(df: pd.DataFrame, log: ResultLog, target_date: datetime):
+    """Data was checked within a reasonable timeframe"""
 
-def positives_rate(row, log: ResultLog):
-    """Check that positives compose <20% test results"""
+    states = df["state"].to_numpy()
+    checkers = df["checker"].to_numpy()
+    updated_at = _as_epoch_ns(df["lastUpdateEt"])
+    checked_at = _as_epoch_ns(df["lastCheckEt"])
 
-    n_pos, n_neg = row.positive, row.negative
-    n_tot = n_pos + n_neg
+    is_blank = checked_at <= pd.Timestamp(START_OF_TIME).value
+    is_near_release = df["phase"].isin(["publish", "update"]).to_numpy()
+    idx = np.flatnonzero(is_blank & is_near_release)
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx], "last check ET (column AK) is blank", message_id="check_is_blank")
 
-    percent_pos = 100.0 * n_pos / n_tot if n_tot > 0 else 0.0
-    if n_tot > 100:
-        if percent_pos > 40.0 and n_pos > 20:
-            log.data_quality(row.state, f"high positives rate {percent_pos:.0f}% (positive={n_pos:,}, total={n_tot:,})")
-    else:
-        if percent_pos > 80.0 and n_pos > 20:
-            log.data_quality(row.state, f"high positives rate {percent_pos:.0f}% (positive={n_pos:,}, total={n_tot:,})")
+    hours = (updated_at - checked_at) / NS_PER_HOUR
+    is_behind = ~is_blank & (hours > 1.0)
+    idx = np.flatnonzero(is_behind)
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx],
+        "Last Check ET (column AJ) is {:%m/%d %H:%M} which is less than Last Update ET (column AI)  {:%m/%d %H:%M} by {:.0f} hours",
+        df["lastCheckEt"].iloc[idx], df["lastUpdateEt"].iloc[idx], hours[idx])
 
-def death_rate(row, log: ResultLog):
-    """Check that deaths are <5% of test results"""
+    hours = (pd.Timestamp(target_date).value - checked_at) / NS_PER_HOUR
+    idx = np.flatnonzero(~is_blank & ~is_behind & (hours > 6.0))
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx],
+        "Last Check ET (column AJ) has not been updated in {:.0f} hours ({:%m/%d %H:%M} by {})",
+        hours[idx], df["lastCheckEt"].iloc[idx], checkers[idx])
 
-    n_pos, n_neg, n_deaths = row.positive, row.negative, row.death
-    n_tot = n_pos + n_neg
-
-    percent_deaths = 100.0 * n_deaths / n_tot if n_tot > 0 else 0.0
-    if n_tot > 100:
-        if percent_deaths > 5.0:
-            log.data_quality(row.state, f"high death rate {percent_deaths:.0f}% (positive={n_deaths:,}, total={n_tot:,})")
-    else:
-        if percent_deaths > 10.0:
-            log.data_quality(row.state, f"high death rate {percent_deaths:.0f}% (positive={n_deaths:,}, total={n_tot:,})")
 
+def batch_checkers_initials(df: pd.DataFrame, log: ResultLog, target_date: datetime):
+    """Confirm that checker initials are records"""
 
-def less_recovered_than_positive(row, log: ResultLog):
-    """Check that we don't have more recovered than positive"""
+    states = df["state"].to_numpy()
+    checked_at = _as_epoch_ns(df["lastCheckEt"])
 
-    if row.recovered > row.positive:
-        log.data_quality(row.state, f"More recovered than positive (recovered={row.recovered:,}, positive={row.positive:,})")
+    is_active = (df["phase"] != "inactive").to_numpy() & (checked_at > pd.Timestamp(START_OF_TIME).value)
+    is_near_release = df["phase"].isin(["publish", "update"]).to_numpy()
 
+    no_checker = df["checker"].fillna("").str.strip().eq("").to_numpy() & is_active
+    no_double_checker = df["doubleChecker"].fillna("").str.strip().eq("").to_numpy() & is_active & ~no_checker
 
-def pendings_rate(row, log: ResultLog):
-    """Check that pendings are not more than 20% of total"""
+    delta_hours = (pd.Timestamp(target_date).value - checked_at) / NS_PER_HOUR
+    is_recent = (0 < delta_hours) & (delta_hours < 5)
 
-    n_pos, n_neg, n_pending = row.positive, row.negative, row.pending
-    n_tot = n_pos + n_neg
-    percent_pending = 100.0 * n_pending / n_tot if n_tot > 0 else 0.0
+    idx = np.flatnonzero(no_checker & is_recent)
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx],
+        "missing checker initials (column AK) but checked date set recently (at {:%m/%d %H:%M})",
+        df["lastCheckEt"].iloc[idx])
+    idx = np.flatnonzero(no_checker & ~is_recent & is_near_release)
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx], "missing checker initials (column AK)")
+    idx = np.flatnonzero(no_double_checker & is_near_release)
+    log.record_many(ResultCategory.DATA_ENTRY, states[idx], "missing double-checker initials (column AL)")
 
-    if n_tot > 1000:
-        if percent_pending > 20.0:
-            log.data_quality(row.state, f"high pending rate {percent_pending:.0f}% (pending={n_pending:,}, total={n_tot:,})")
-    else:
-        if percent_pending > 80.0:
-            log.data_quality(row.state, f"high pending rate {percent_pending:.0f}% (pending={n_pending:,}, total={n_tot:,})")
+    #elif hours > 18.0:
+    #   log.data_source(row.state, f"Last Updated (col T) hasn't been updated in {hours:.0f}  hours")
 
 
 # ----------------------------------------------------------------
@@ -311,20 +301,50 @@ def counties_rollup_to_state(row, counties: pd.DataFrame, log: ResultLog):
 
 # ----------------------------------------------------------------
 
-IGNORE_THRESHOLDS = {
-    "positive": 100,
-    "negative": 900,
-    "death": 20,
-}
+# cumulative columns checked by increasing_values, with parallel per-column arrays
+CHECK_COLS = ("positive", "negative", "death", "hospitalizedCumulative", "inIcuCumulative", "onVentilatorCumulative")
+CHECK_DISPLAY_NAMES = ("positive", "negative", "death", "hospitalized", "icu", "ventilator")
 
-def find_last_change(val, vec_vals: pd.Series, vec_date) -> Tuple[int, datetime]:
-    vals = vec_vals.values
-    for i in range(len(vals)):
-        if vals[i] != val: 
-            sdate = str(vec_date.values[i])
-            d = datetime(int(sdate[0:4]), int(sdate[4:6]), int(sdate[6:8]))
-            return vals[i], udatetime.naivedatetime_as_eastern(d)
-    return 0, None
+# allow value to be the same if below a threshold
+IGNORE_ARR = np.array([100, 900, 20, 10, 10, 10], dtype=np.int64)
+
+# per-column results from _scan_columns
+SCAN_CHANGED, SCAN_DECREASED, SCAN_BELOW_THRESHOLD, SCAN_NOT_A_NUMBER, SCAN_UNCHANGED, SCAN_CONSTANT = range(6)
+
+def _scan_columns(current: np.ndarray, history: np.ndarray, thresholds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Compare the current values to the history for all columns at once
+
+    current has one value per column, history is a (days x columns) matrix (newest first).
+    returns a SCAN_* code per column and the index of the newest history entry that
+    differs from the current value (only meaningful for SCAN_UNCHANGED)
+    """
+
+    n_cols = current.shape[0]
+    if history.shape[0] > 0:
+        prev = history[0]
+        is_diff = history != current
+        has_changed = is_diff.any(axis=0)
+        last_change = is_diff.argmax(axis=0)
+    else:
+        prev = np.zeros(n_cols, dtype=current.dtype)
+        has_changed = np.zeros(n_cols, dtype=bool)
+        last_change = np.zeros(n_cols, dtype=np.int64)
+
+    # assign from lowest to highest precedence
+    codes = np.full(n_cols, SCAN_CHANGED, dtype=np.int64)
+    is_same = current == prev
+    codes[is_same & ~has_changed] = SCAN_CONSTANT
+    codes[is_same & has_changed] = SCAN_UNCHANGED
+    codes[current == -1000] = SCAN_NOT_A_NUMBER
+    codes[current < thresholds] = SCAN_BELOW_THRESHOLD
+    codes[(current < prev) & (current > 0) & (prev != 0)] = SCAN_DECREASED # negative values indicate blank/errors
+    return codes, last_change
+
+def _date_as_eastern(date: int) -> datetime:
+    " convert a YYYYmmdd int into a tz-aware date "
+    sdate = str(date)
+    d = datetime(int(sdate[0:4]), int(sdate[4:6]), int(sdate[6:8]))
+    return udatetime.naivedatetime_as_eastern(d)
 
 def increasing_values(row, df: pd.DataFrame, log: ResultLog, config: QCConfig = None) -> bool:
     """Check that new values more than previous values
@@ -337,13 +357,15 @@ def increasing_values(row, df: pd.DataFrame, log: ResultLog, config: QCConfig =
 
     if not config: config = QCConfig()
 
-    df = df[df.date < row.targetDate]
-
-    dict_row = row._asdict()
+    # history is newest first so the days before the target date are a tail slice
+    dates = df["date"].to_numpy()
+    n_before = np.searchsorted(dates[::-1], row.targetDate, side="left")
+    df = df.iloc[len(dates) - n_before:]
+    dates = dates[len(dates) - n_before:]
 
     # local time is an editable field that it supposed to be the last time the data changed.
     # last_updated is the same value but adjusted to eastern TZ 
-    if "localTime" in dict_row:
+    if hasattr(row, "localTime"):
         local_time = row.localTime 
         d_local = local_time.year * 10000 + local_time.month * 100 + local_time.day
     else:
@@ -364,84 +386,75 @@ def increasing_values(row, df: pd.DataFrame, log: ResultLog, config: QCConfig =
 
     if debug: logger.debug(f"check {row.state}")
 
-    fieldList = ["positive", "negative", "death", "hospitalizedCumulative", "inIcuCumulative", "onVentilatorCumulative"]
-    displayList = ["positive", "negative", "death", "hospitalized", "icu", "ventilator"]
-
-    source_messages = []
     has_issues, consolidate, n_days, n_days_prev = False, True, -1, 0
-    for c in fieldList:
-        val = dict_row.get(c)
-        if val is None:
+
+    columns, ordinals = [], []
+    for k, c in enumerate(CHECK_COLS):
+        if getattr(row, c, None) is None:
             log.internal(row.state, f"{c} missing column")
             has_issues, consolidate = True, False
             if debug: logger.debug(f"  {c} missing column")
-            continue
-        if not c in df.columns:
+        elif not c in df.columns:
             log.internal(row.state, f"{c} missing history column")
             has_issues, consolidate = True, False
             if debug: logger.debug(f"  {c} missing history column")
-            continue
+        else:
+            columns.append(c)
+            ordinals.append(k)
+
+    thresholds = IGNORE_ARR[ordinals]
 
-        vec = df[c].values
+    current = np.array([getattr(row, c) for c in columns], dtype=np.int64)
+    history = df[columns].to_numpy(dtype=np.int64)
+    codes, last_change = _scan_columns(current, history, thresholds)
 
-        prev_val = vec[0] if vec.size > 0 else 0
-        prev_date = df["date"].iloc[0] if vec.size > 0 else 0
+    prev_vals = history[0] if history.shape[0] > 0 else np.zeros(len(columns), dtype=np.int64)
+    prev_date = dates[0] if dates.size > 0 else 0
 
+    # unchanged columns, the messages are only built if they are not consolidated
+    unchanged = []
+    for j, c in enumerate(columns):
+        val, prev_val, code = current[j], prev_vals[j], codes[j]
 
-        if val < prev_val and (val > 0 and prev_val != 0): # negative values indicate blank/errors
+        if code == SCAN_DECREASED:
             sd = str(prev_date)[4:] if prev_date > 0 else "-"
             sd = sd[0:2] + "/" + sd[2:4] 
             log.data_quality(row.state, f"{c} ({val:,}) decreased from {prev_val:,} as-of {sd}")
             has_issues, consolidate = True, False
             if debug: logger.debug(f"  {c} ({val:,}) decreased from {prev_val:,} as-of {sd}")
-            continue
-
-        # allow value to be the same if below a threshold, default to 10
-        t = IGNORE_THRESHOLDS.get(c)
-        if t == None: t = 10
-        if val < t: 
+        elif code == SCAN_BELOW_THRESHOLD:
             if debug: logger.debug(f"  {c} ({val:,}) is below threshold -> ignore 'same' check")
-            continue
-
-        #phase = row.phase
-        #checked_at = row.lastCheckEt.to_pydatetime()
-        #is_check_field_set = checked_at > START_OF_TIME
-
-        if val == -1000:
+        elif code == SCAN_NOT_A_NUMBER:
             log.data_entry(row.state, f"{c} value cannot be converted to a number")
             has_issues, consolidate = True, False
             if debug: logger.debug(f"  {c} was not a number in source data")
-            continue
+        elif code == SCAN_UNCHANGED:
+            changed_date = _date_as_eastern(dates[last_change[j]])
+            n_days = int((d_target - changed_date).total_seconds() // (60*60*24))
+            d_last_change = max(d_last_change, changed_date)
 
-        if val == prev_val:
-            changed_val, changed_date = find_last_change(val, df[c], df["date"])
+            unchanged.append((c, val, changed_date, n_days))
 
-            n_days = int((d_target - changed_date).total_seconds() // (60*60*24))
-            if n_days >= 0:
-                d_last_change = max(d_last_change, changed_date)
-
-                source_messages.append(f"{c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days} days)")
-                
-                # check if we can still consolidate results
-                if n_days_prev == 0:
-                    n_days_prev = n_days
-                    if debug: logger.debug(f"  {c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days} days)")
-                elif n_days_prev == n_days:
-                    if debug: logger.debug(f"  {c} ({val:,}) also hasn't changed since {changed_date.month}/{changed_date.day}")
-                else:
-                    consolidate = False
-                    if debug: logger.debug(f"  {c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days} days ago) -> force individual lines ")
+            # check if we can still consolidate results
+            if n_days_prev == 0:
+                n_days_prev = n_days
+                if debug: logger.debug(f"  {c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days} days)")
+            elif n_days_prev == n_days:
+                if debug: logger.debug(f"  {c} ({val:,}) also hasn't changed since {changed_date.month}/{changed_date.day}")
             else:
-                d_last_change = max(d_last_change, df["date"].values[-1])
-                has_issues, consolidate = True, False
-                log.data_source(row.state, f"{c} ({val:,}) constant for all time")
-                if debug: logger.debug(f"  {c} ({val:,}) constant -> force individual lines ")
+                consolidate = False
+                if debug: logger.debug(f"  {c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days} days ago) -> force individual lines ")
+        elif code == SCAN_CONSTANT:
+            d_last_change = max(d_last_change, _date_as_eastern(dates[-1]))
+            has_issues, consolidate = True, False
+            log.data_source(row.state, f"{c} ({val:,}) constant for all time")
+            if debug: logger.debug(f"  {c} ({val:,}) constant -> force individual lines ")
         else:
             consolidate = False
             if debug: logger.debug(f"  {c} ({val:,}) changed from {prev_val:,} on {prev_date}")
 
 
-    if len(source_messages) == 0:
+    if len(unchanged) == 0:
         if debug: logger.debug(f"  no source messages -> has_issues={has_issues}")
         return has_issues
 
@@ -457,12 +470,13 @@ def increasing_values(row, df: pd.DataFrame, log: ResultLog, config: QCConfig =
         if debug: logger.debug(f"  checker {checker} set local time (column V) to {sd_local} but values haven't changed since {sd} ({n_days:.0f} days ago)")
 
     if consolidate:
-        names = "/".join(displayList)
+        names = "/".join(CHECK_DISPLAY_NAMES)
         log.data_source(row.state, f"cumulative values ({names}) haven't changed since {d_last_change.month}/{d_last_change.day} ({n_days:.0f} days)")
         if debug: logger.debug(f"  cumulative values ({names}) haven't changed since {d_last_change.month}/{d_last_change.day} ({n_days:.0f} days)")
     else:
-        for m in source_messages: log.data_source(row.state, m)
-        if debug: logger.debug(f"  {row.state}: record {len(source_messages)} source issue(s) to log")
+        for c, val, changed_date, n_days_c in unchanged:
+            log.data_source(row.state, f"{c} ({val:,}) hasn't changed since {changed_date.month}/{changed_date.day} ({n_days_c} days)")
+        if debug: logger.debug(f"  {row.state}: record {len(unchanged)} source issue(s) to log")
     return has_issues
 
 # disabled because the fields measure different things. apples-to-oranges
@@ -553,19 +567,16 @@ def monotonically_increasing(df: pd.DataFrame, log: ResultLog):
     if state != df["state"].max():
         raise Exception("Expected input to be for a single state")
 
-    # TODO: don't group on state -- this is already filtered to a single state
-    df = df.sort_values(["state", "date"], ascending=True)
-    df_lagged = df.groupby("state")[columns_to_check] \
-        .shift(1) \
-        .rename(columns=lambda c: c+"_lag")
-
-    df_comparison = df.merge(df_lagged, left_index=True, right_index=True, how="left")
+    df = df.sort_values("date", ascending=True)
+    dates = df["date"].to_numpy()
+    values = df[columns_to_check].to_numpy()
 
     # check that all the counts are >= the previous day
-    for col in columns_to_check:
-        if (df_comparison[f"{col}_lag"] > df_comparison[col]).any():
-            error_dates = df_comparison.loc[(df_comparison[f"{col}_lag"] > df_comparison[col])]["date"]
-            error_dates_str = error_dates.astype(str).str.cat(sep=", ")
+    is_decrease = np.diff(values, axis=0) < 0
+    for j, col in enumerate(columns_to_check):
+        rows = np.flatnonzero(is_decrease[:, j]) + 1
+        if rows.size > 0:
+            error_dates_str = ", ".join(str(d) for d in dates[rows])
 
             log.data_quality(state, f"{col} values decreased from the previous day (on {error_dates_str})")
 
@@ -599,9 +610,12 @@ def expected_positive_increase( row, history: pd.DataFrame,
     forecast.fit(history)
     forecast.project(current)
 
+    # h5py/matplotlib are only loaded when a run saves or plots the forecasts
     if config.save_results:
+        from .modeling.forecast_io import save_forecast_hd5
         save_forecast_hd5(forecast, config.results_dir)
     elif config.plot_models:
+        from .modeling.forecast_plot import plot_to_file
         plot_to_file(forecast, f"{config.images_dir}/{context}", FIT_THRESHOLDS)
 
     actual_value, expected_linear, expected_exp = forecast.results
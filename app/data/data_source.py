@@ -27,9 +27,10 @@ KEY_PATH = "credentials-scanner.json"
 
 class DataSource:
 
-    def __init__(self):
+    def __init__(self, sheet_cache_seconds = 0):
 
         self._target_date = None
+        self.sheet_cache_seconds = sheet_cache_seconds # reuse google sheet responses on disk (0 = off)
         self.log = ErrorLog()
 
         self.failed = {}
@@ -223,7 +224,7 @@ class DataSource:
             'Doublechecker':'doubleChecker'
         }
 
-        gs = WorksheetWrapper()
+        gs = WorksheetWrapper(cache_seconds=self.sheet_cache_seconds)
         dev_id = gs.get_sheet_id_by_name("dev")
         df = gs.read_as_frame(dev_id, "Worksheet 2!A2:AL60", header_rows=1)
 
@@ -324,13 +325,13 @@ class DataSource:
 
         df.fillna(0.0, inplace=True)
 
-        # counts
+        # counts (int32 is plenty for a single state and halves the history's size)
         for c in ["positive", "negative", "pending", "hospitalized", "death", "recovered", "total", "totalTestResults"]:
-            df[c] = df[c].astype(np.int)
+            df[c] = df[c].astype(np.int32)
         for c in ["positiveIncrease", "negativeIncrease", "hospitalizedIncrease", "deathIncrease", "totalTestResultsIncrease"]:
-            df[c] = df[c].astype(np.int)
+            df[c] = df[c].astype(np.int32)
         for c in ['hospitalizedCumulative', 'inIcuCumulative', 'onVentilatorCumulative']:
-            df[c] = df[c].astype(np.int)
+            df[c] = df[c].astype(np.int32)
 
 
         df["dateChecked"] = pd.to_datetime(df["dateChecked"])
@@ -2,29 +2,75 @@
 # Manages getting data out of Google sheets
 #
 
+import os
+import time
+import json
+import shutil
+import hashlib
 from typing import List, Dict
 from loguru import logger
 import pandas as pd
 import numpy as np
-import re
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+# orjson is optional, it is only used to speed up json parsing/writing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 KEY_PATH = "credentials-scanner.json"
 
+# responses can be cached on disk so quick reruns of the CLI don't hit the API again.
+# caching is off by default (cache_seconds=0) so the service always reads the sheet;
+# a cached copy can be up to CACHE_SECONDS old.
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qc")
+CACHE_SECONDS = 60
+
+def cache_path(sheet_id: str, cell_range: str) -> str:
+    " location of the cached values for a range "
+    key = hashlib.sha1(f"{sheet_id}|{cell_range}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def clear_cache():
+    " delete all cached responses "
+    if os.path.isdir(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR)
+
+def _response_model():
+    " model for the google client that parses responses with orjson, None to use the default "
+    if orjson is None: return None
+
+    from googleapiclient.model import JsonModel
+
+    class OrjsonModel(JsonModel):
+        def deserialize(self, content):
+            try:
+                body = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                return super().deserialize(content)
+            if self._data_wrapper and "data" in body:
+                body = body["data"]
+            return body
+
+    return OrjsonModel()
+
 class WorksheetWrapper():
 
-    def __init__(self, debug = True):
+    def __init__(self, debug = True, cache_seconds = 0):
         logger.info("load credentials")
 
+        # the google client libraries are slow to import, only load them when connecting
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         # pylint: disable=no-member
         self.creds = service_account.Credentials.from_service_account_file(
             KEY_PATH,
             scopes=SCOPES)
 
         self.debug = debug
+        self.cache_seconds = cache_seconds
         if self.debug:
             logger.info(f"  email {self.creds.service_account_email}")
             logger.info(f"  project {self.creds.project_id}")
@@ -36,7 +82,7 @@ class WorksheetWrapper():
             logger.info("")
 
         if self.debug: logger.info("connect")
-        service = build('sheets', 'v4', credentials=self.creds)
+        service = build('sheets', 'v4', credentials=self.creds, model=_response_model())
         self.sheets = service.spreadsheets()
 
 
@@ -63,17 +109,57 @@ class WorksheetWrapper():
         return rec["id"]
 
 
+    def read_cached(self, sheet_id: str, cell_range: str) -> List[List]:
+        """Read values saved by a recent call, None if missing or expired"""
+
+        if self.cache_seconds <= 0: return None
+
+        xpath = cache_path(sheet_id, cell_range)
+        if not os.path.exists(xpath): return None
+        if time.time() - os.path.getmtime(xpath) > self.cache_seconds: return None
+
+        try:
+            with open(xpath, "rb") as f:
+                content = f.read()
+            values = orjson.loads(content) if orjson is not None else json.loads(content)
+        except Exception as ex:
+            logger.warning(f"could not read cache for {cell_range}: {ex}")
+            return None
+
+        if self.debug: logger.info(f"read {cell_range} from cache")
+        return values
+
+    def write_cached(self, sheet_id: str, cell_range: str, values: List[List]):
+        """Save values for later calls"""
+
+        if self.cache_seconds <= 0: return
+
+        xpath = cache_path(sheet_id, cell_range)
+        tmp_path = xpath + ".tmp"
+        try:
+            if not os.path.isdir(CACHE_DIR): os.makedirs(CACHE_DIR)
+            content = orjson.dumps(values) if orjson is not None else json.dumps(values).encode("utf-8")
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, xpath)
+        except Exception as ex:
+            logger.warning(f"could not write cache for {cell_range}: {ex}")
+
+
     def read_values(self, sheet_id: str, cell_range: str) -> List[List]:
         """Read results as a list of lists"""
 
+        values = self.read_cached(sheet_id, cell_range)
+        if values is not None: return values
+
         if self.debug: logger.info(f"read {cell_range}")
-        result = self.sheets.values().get(spreadsheetId=sheet_id, range=cell_range).execute()
+        result = self.sheets.values().get(spreadsheetId=sheet_id, range=cell_range).execute(num_retries=2)
         #if self.debug: logger.info(f"  {result}")
 
         values = result.get('values', [])
+        self.write_cached(sheet_id, cell_range, values)
         return values
 
-
     def read_as_frame(self, sheet_id: str, cell_range: str, header_rows = 1) -> pd.DataFrame:
         """Read results as a data frame, first row is headers"""
 
@@ -96,20 +182,15 @@ class WorksheetWrapper():
 
         n_cols = len(header)
 
-        data = [[] for n in header]
-        for r in values[header_rows:]:
-            n_vals = len(r)
-            if n_vals == 0: continue
-            if n_vals < n_cols:
-                #logger.warning(f"fewer columns than expected ({n_cols})")
-                #logger.warning(f"  {r}")
-                pass
-            for i in range(n_vals):
-                data[i].append(r[i])
-            for i in range(n_vals, n_cols):
-                data[i].append('')
-
-        xdict = {}
-        for n, vals in zip(header, data): xdict[n] = vals
-        return pd.DataFrame(xdict)
+        # the API drops trailing blank cells so pad short rows (and skip empty ones)
+        rows = [(r + [''] * (n_cols - len(r)))[:n_cols] for r in values[header_rows:] if len(r) > 0]
+        if len(rows) > 0:
+            cells = np.array(rows, dtype=object)
+        else:
+            cells = np.empty((0, n_cols), dtype=object)
+
+        # repeated names (e.g. blank headers) keep the last column, in the position of the first
+        columns = {}
+        for i, n in enumerate(header): columns[n] = i
+        return pd.DataFrame(cells[:, list(columns.values())], columns=list(columns))
 
@@ -4,6 +4,12 @@
 #
 #   message_id is optional.  if set, the messages are consolidated into single line if than 10 of them.
 #
+#   record_many takes a str.format template and its arguments instead of a message.
+#   the text is built in consolidate(), so checks that report many rows don't do any
+#   formatting themselves.  if a message cannot be formatted it is replaced with an
+#   internal message for that location.  the ms of a record_many call is split
+#   evenly across its messages.
+#
 from enum import Enum
 import json
 import io
@@ -26,17 +32,33 @@ class ResultMessage:
     __slots__ = (
         'category',
         'location',
-        'message',
+        '_message',
         'ms',
-        'message_id'
+        'message_id',
+        '_template',
+        '_args'
     )
 
-    def __init__(self, category: ResultCategory, location: str, message: str, ms: int, message_id: str = ""):
+    def __init__(self, category: ResultCategory, location: str, message: str, ms: int, message_id: str = "",
+            template: str = None, args: Tuple = None):
         self.category = category
         self.location = location
-        self.message = message
+        self._message = message
         self.ms = ms
         self.message_id = message_id
+        self._template = template
+        self._args = args
+
+    @property
+    def message(self) -> str:
+        if self._message is None:
+            self._message = self._template.format(*self._args)
+            self._template, self._args = None, None
+        return self._message
+
+    @message.setter
+    def message(self, value: str):
+        self._message = value
 
     def to_dict(self) -> Dict:
         return { "category": self.category.value, "location": self.location, 
@@ -62,12 +84,32 @@ class ResultLog():
     def add(self, category: ResultCategory, location: str, message: str,
             message_id: str = "") -> None:
         if message is None: raise Exception("Missing message")
+        self._append(category, location, message, message_id)
 
+    def record_many(self, category: ResultCategory, locations: List[str], template: str, *args,
+            message_id: str = "") -> None:
+        " record a message per location, args are sequences parallel to locations "
+        if template is None: raise Exception("Missing template")
+        n = len(locations)
+        if n == 0: return
+        delta_ms = self._elapsed_ms() / n
+        for location, *values in zip(locations, *args):
+            self._append(category, location, None, message_id, template, values, ms=int(delta_ms))
+
+    def _elapsed_ms(self) -> float:
+        " time since the previous message "
         end = time.process_time_ns()
-        delta_ms = int((end - self.start) * 1e-6)
+        delta_ms = (end - self.start) * 1e-6
         self.start = end
+        return delta_ms
 
-        msg = ResultMessage(category, location, message, delta_ms, message_id=message_id)
+    def _append(self, category: ResultCategory, location: str, message: str, message_id: str,
+            template: str = None, args: Tuple = None, ms: int = None) -> None:
+
+        if ms is None: ms = int(self._elapsed_ms())
+
+        msg = ResultMessage(category, location, message, ms, message_id=message_id,
+            template=template, args=args)
         self._messages.append(msg)
 
     #def error(self, location: str, message: str) -> None:
@@ -88,8 +130,31 @@ class ResultLog():
 
     # -----
 
+    def sort_by_location(self, locations: List[str]):
+        """Group the messages by location in the given order
+
+        The sort is stable so each location keeps its own messages in the order they were
+        added.  Locations not in the list (e.g. internal notes) go last.
+        """
+        rank = {}
+        for i, x in enumerate(locations): rank.setdefault(x, i)
+        n = len(rank)
+        self._messages.sort(key=lambda x: rank.get(x.location, n))
+
+    def format_messages(self):
+        " build the deferred messages, a bad template/argument becomes an internal message "
+        for i, x in enumerate(self._messages):
+            if x._message is not None: continue
+            try:
+                x.message
+            except Exception as ex:
+                self._messages[i] = ResultMessage(ResultCategory.INTERNAL, x.location,
+                    f"could not format message '{x._template}': {ex}", x.ms)
+
     def consolidate(self):
 
+        self.format_messages()
+
         # build a list by ids
         ids = {}
         for i in range(len(self._messages)):
@@ -207,6 +272,7 @@ def test():
     log.data_quality("NY", "Looking kinda scary.  > 50K")
     log.data_source("TX", "We're missing stuff, find it")
     log.data_entry("FL", '"Let''s Ignore It"')
+    log.record_many(ResultCategory.DATA_QUALITY, ["CA", "WA"], "high rate {:.0f}% (positive={:,})", [45.2, 51.0], [12000, 3400])
 
     print("--- print ----")
     log.print()
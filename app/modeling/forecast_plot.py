@@ -14,6 +14,7 @@ import pandas as pd
 import numpy as np
 from loguru import logger
 import matplotlib
+matplotlib.use("Agg") # only writes files, also safe to use from worker processes
 import matplotlib.pyplot as plt
 
 from .forecast import Forecast, _exp_fit, _linear_fit
@@ -71,8 +72,10 @@ def plot_to_file(forecast: Forecast, image_dir: str, fit_thresholds: list):
     # TODO: Might want to save these to s3?
     # This write-to-file step adds ~1 sec of runtime / state
 
-    if not os.path.isdir(image_dir): os.makedirs(image_dir)
+    # several workers may plot at the same time
+    os.makedirs(image_dir, exist_ok=True)
 
     fn = f"predicted_positives_{forecast.state}_{forecast.date}.png"
     plt.savefig(os.path.join(image_dir, fn), dpi=250, bbox_inches = "tight")
+    plt.close("all")
 
@@ -7,6 +7,7 @@ from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
 from app.util import read_config_file
 from app.qc_config import QCConfig
 from app.data.data_source import DataSource
+from app.data.worksheet_wrapper import clear_cache, CACHE_SECONDS
 from app.check_dataset import check_current, check_working, check_history
 
 
@@ -54,6 +55,10 @@ def load_args_parser(config) -> ArgumentParser:
         help='plot the model curves')
 
 
+    parser.add_argument(
+        '--refresh', dest='refresh', action='store_true', default=False,
+        help='ignore cached google sheet responses')
+
     parser.add_argument(
         '--results_dir',
         default=config["CHECKS"]["results_dir"],
@@ -95,7 +100,12 @@ def main() -> None:
     if len(args.state) != 0:
         logger.error("  [states filter not implemented]")
 
-    ds = DataSource()
+    if args.refresh:
+        logger.info("  [clear google sheet cache]")
+        clear_cache()
+
+    # the CLI reuses sheet responses for quick reruns, the service does not
+    ds = DataSource(sheet_cache_seconds=CACHE_SECONDS)
 
     if args.check_working:
         logger.info("--| QUALITY CONTROL --- GOOGLE WORKING SHEET |------")